@@ -30,6 +30,12 @@ class Config(yaml2pyclass.CodeGenerator):
         class HttpClientClass:
             timeout: int
         
+        @dataclasses.dataclass
+        class CacheClass:
+            token_cache_size: int
+            model_check_interval: int
+            get_routes: list
+        
         @dataclasses.dataclass
         class InferenceClass:
             @dataclasses.dataclass
@@ -48,6 +54,7 @@ class Config(yaml2pyclass.CodeGenerator):
             
             primary_url: str
             secondary_api_handler: str
+            batch_concurrency: int
             tabby_api: TabbyApiClass
             mistral: MistralClass
             openrouter: OpenrouterClass
@@ -55,6 +62,7 @@ class Config(yaml2pyclass.CodeGenerator):
         general: GeneralClass
         regex: RegexClass
         http_client: HttpClientClass
+        cache: CacheClass
         inference: InferenceClass
     
     configuration: ConfigurationClass
@@ -1,3 +1,4 @@
+import copy
 import re
 from functools import lru_cache
 from typing import Dict, List, Tuple
@@ -28,8 +29,15 @@ class InferenceBase:
         self.last_index = 0
         self.new_cot_prompt = False
 
+    def fork(self) -> "InferenceBase":
+        """Create a handler with fresh per-request state which shares the config and SDK client of this one."""
+        handler = copy.copy(self)
+        handler._reset_state()
+        return handler
+
+    @staticmethod
     @lru_cache(maxsize=128)
-    def _compile_regex(self, pattern: str) -> re.Pattern:
+    def _compile_regex(pattern: str) -> re.Pattern:
         return re.compile(pattern, re.MULTILINE | re.DOTALL)
 
     def full_completion(self, completion_request: dict, stored_last_message: str):
@@ -24,7 +24,7 @@ class MistralInference(InferenceBase):
             {"role": "user", "content": constructed_prompt.format(username=self.username, character=self.character)}
         )
         while True:
-            chat_response = self.client.chat.complete(
+            chat_response = await self.client.chat.complete_async(
                 model=self.config.configuration.inference.mistral.model, messages=chat
             )
             response = chat_response.choices[0].message.content
@@ -67,7 +67,7 @@ class MistralInference(InferenceBase):
             if stored_last_message != last_message or self.new_cot_prompt:
                 logger.info("New context, generating new CoT.")
                 while self.response == "" or self.response_tokens < 200:
-                    chat_response = self.client.chat.complete(
+                    chat_response = await self.client.chat.complete_async(
                         model=self.config.configuration.inference.mistral.model, messages=chat
                     )
                     self.response = chat_response.choices[0].message.content
@@ -1,4 +1,4 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from src import Config, InferenceBase
 from src.utility import database
@@ -7,7 +7,7 @@ from src.utility import database
 class OpenRouterInference(InferenceBase):
     def __init__(self, config: Config):
         super().__init__(config)
-        self.client = OpenAI(
+        self.client = AsyncOpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=config.configuration.inference.openrouter.api_key,
         )
@@ -18,7 +18,7 @@ class OpenRouterInference(InferenceBase):
 
         if stored_last_message != last_message or self.new_cot_prompt:
             while self.response == "" or self.response_tokens < 200:
-                chat_response = self.client.chat.completions.create(
+                chat_response = await self.client.chat.completions.create(
                     model=self.config.configuration.inference.openrouter.model,
                     messages=chat,
                 )
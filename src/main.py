@@ -1,17 +1,23 @@
 # coding: utf-8
+import asyncio
+import hashlib
 import json
+import threading
+import time
 from contextlib import asynccontextmanager
 from functools import lru_cache
 from typing import Any, Dict
 
 import httpx
 from fastapi import APIRouter, Body, FastAPI, HTTPException, Header, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from loguru import logger
 
 from src import Config, MistralInference, OpenRouterInference, TabbyApiInference, Variables
 from src.utility import database
+from src.utility.cache import LRUCache, TTLCache, make_key
 from src.utility.logger import setup_logger
+from src.utility.profiler import MAX_DURATION, SamplingProfiler
 
 # Initialize core components
 config = Config.from_yaml("config.yaml")
@@ -19,6 +25,12 @@ timeout = httpx.Timeout(config.configuration.http_client.timeout, read=None)
 client = httpx.AsyncClient(timeout=timeout)
 router = APIRouter()
 variables = Variables(config, timeout)
+token_cache = LRUCache(config.configuration.cache.token_cache_size)
+get_cache = TTLCache()
+GET_CACHE_TTLS = {route["path"].strip("/"): route["ttl"] for route in config.configuration.cache.get_routes}
+# POST routes of the primary endpoint which change what the cached GET routes return
+INVALIDATING_PREFIXES = ("v1/model", "v1/lora", "v1/template")
+profiler_lock = asyncio.Lock()
 
 # Initialize inference handler based on config
 INFERENCE_HANDLERS = {"mistral": MistralInference, "tabbyapi": TabbyApiInference, "openrouter": OpenRouterInference}
@@ -30,7 +42,9 @@ if handler not in INFERENCE_HANDLERS:
 inference = INFERENCE_HANDLERS[handler](config)
 
 
-async def make_request(method: str, url: str, headers: dict = None, body: Any = None, stream: bool = False):
+async def make_request(
+    method: str, url: str, headers: dict = None, body: Any = None, stream: bool = False, with_status: bool = False
+):
     """Unified request handler"""
     kwargs = {"headers": headers or {}}
     if body:
@@ -40,9 +54,10 @@ async def make_request(method: str, url: str, headers: dict = None, body: Any =
         response = await getattr(client, method.lower())(url, **kwargs)
         # noinspection PyBroadException
         try:
-            return response.json()
+            result = response.json()
         except:  # noqa: E722
-            return response.text
+            result = response.text
+        return (response.status_code, result) if with_status else result
     else:
         return client.stream(method, url, **kwargs)
 
@@ -54,6 +69,27 @@ async def stream_response(response):
             yield chunk
 
 
+async def get_loaded_model(headers: dict) -> str | None:
+    """Get the model loaded on the primary endpoint, clearing the token cache when it changes"""
+    now = time.monotonic()
+    if now - variables.model_checked_at < config.configuration.cache.model_check_interval:
+        return variables.loaded_model
+
+    variables.model_checked_at = now
+    model = await make_request("GET", f"{variables.primary_url}/v1/model", headers)
+    model_id = model.get("id") if isinstance(model, dict) else None
+
+    # A failed or unauthorized check says nothing about the loaded model, keep the last known one
+    if not isinstance(model_id, str):
+        return variables.loaded_model
+
+    if variables.loaded_model is not None and model_id != variables.loaded_model:
+        token_cache.clear()
+    variables.loaded_model = model_id
+
+    return model_id
+
+
 @lru_cache(maxsize=1)
 async def get_cached_thought():
     return await database.get_latest_log()
@@ -83,6 +119,72 @@ async def get_thoughts(request: Request, authorization: str = Header(None)):
     return {"content": "No thoughts available."}
 
 
+@router.post("/v1/profile")
+async def profile_endpoint(seconds: float = 10, output: str = "collapsed", authorization: str = Header(None)):
+    """Sample the event loop thread for the given number of seconds"""
+    if authorization != config.configuration.general.dev_api_key:
+        raise HTTPException(status_code=401, detail="Missing or invalid authorization.")
+    if output not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="Output must be either collapsed or speedscope.")
+    if profiler_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being captured.")
+
+    async with profiler_lock:
+        profiler = SamplingProfiler(threading.get_ident())
+        await profiler.run(min(max(seconds, 0), MAX_DURATION))
+
+    # Both outputs carry the event loop lag report of the same capture next to the profile
+    if output == "collapsed":
+        return Response(
+            content=profiler.collapsed_archive(),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="profile.zip"'},
+        )
+    return JSONResponse(
+        profiler.speedscope(), headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'}
+    )
+
+
+async def batch_item_completion(
+    index: int, prompt: str, completion_request: dict, url: str, headers: dict, semaphore: asyncio.Semaphore
+) -> dict:
+    """Generate the Chain of Thought for a single batch prompt and submit it to the primary endpoint"""
+    item_request = {**completion_request, "prompt": prompt, "stream": False}
+    try:
+        async with semaphore:
+            # Inference handlers keep per-request state, so every item gets its own fork sharing the SDK client
+            _, expanded, _ = await inference.fork().cot_completion(
+                completion_request=item_request, stored_last_message=""
+            )
+        if not expanded:
+            return {"index": index, "error": "No Chain of Thought was generated for this prompt."}
+
+        item_request["prompt"] = expanded
+        status, result = await make_request("POST", url, headers, item_request, with_status=True)
+        if not 200 <= status < 300 or not isinstance(result, dict) or "detail" in result or "error" in result:
+            return {"index": index, "status": status, "error": result}
+        return {"index": index, "result": result}
+    except Exception as e:
+        logger.error(f"Batch item {index} failed: {e}")
+        return {"index": index, "error": str(e)}
+
+
+async def batch_completion(completion_request: dict, url: str, headers: dict):
+    """Complete all batch prompts concurrently, yielding NDJSON lines in completion order"""
+    semaphore = asyncio.Semaphore(config.configuration.inference.batch_concurrency)
+    tasks = [
+        asyncio.create_task(batch_item_completion(index, prompt, completion_request, url, headers, semaphore))
+        for index, prompt in enumerate(completion_request["prompt"])
+    ]
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield json.dumps(await task) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 @router.post("/v1/completions")
 async def completion_request_handler(
     request: Request,
@@ -96,6 +198,12 @@ async def completion_request_handler(
     if not health:
         raise HTTPException(status_code=502, detail="The TabbyAPI instance is unavailable")
 
+    url = f"{config.configuration.inference.primary_url}{request.url.path}"
+    headers = {"x-api-key": x_api_key, "Authorization": authorization}
+
+    if isinstance(completion_request.get("prompt"), list):
+        return StreamingResponse(batch_completion(completion_request, url, headers), media_type="application/x-ndjson")
+
     # Generate Chain of Thought
     message, expanded, last_message = await inference.cot_completion(
         completion_request=completion_request, stored_last_message=variables.last_message
@@ -107,9 +215,6 @@ async def completion_request_handler(
 
     completion_request["prompt"] = variables.last_expanded
 
-    url = f"{config.configuration.inference.primary_url}{request.url.path}"
-    headers = {"x-api-key": x_api_key, "Authorization": authorization}
-
     if completion_request.get("stream"):
         response = await make_request("POST", url, headers, completion_request, stream=True)
         return StreamingResponse(stream_response(response), media_type="application/json")
@@ -128,7 +233,31 @@ async def token_endpoint_handler(
     """Handle token encode/decode requests"""
     url = f"{variables.primary_url}{request.url.path}"
     headers = {"x-api-key": x_api_key, "Authorization": authorization}
-    return await make_request("POST", url, headers, body)
+
+    model = await get_loaded_model(headers)
+    if model is None:
+        return await make_request("POST", url, headers, body)
+
+    key = make_key(action, model, x_api_key, authorization, body)
+    if (cached := token_cache.get(key)) is None:
+        status, result = await make_request("POST", url, headers, body, with_status=True)
+        if not 200 <= status < 300 or not isinstance(result, dict) or "detail" in result or "error" in result:
+            return JSONResponse(status_code=status, content=result)
+
+        # Store the encoded body, so the cache size matches the memory used and hits skip the re-encode
+        cached = json.dumps(result).encode("utf-8")
+        token_cache.put(key, cached, len(cached) + len(key))
+
+    return Response(content=cached, media_type="application/json")
+
+
+async def fetch_get(path: str, url: str, headers: dict) -> tuple[int, Any]:
+    """Forward a GET request to the primary endpoint, returning the upstream status code and result"""
+    if path == "v1/model/list":
+        health = await make_request("GET", f"{config.configuration.inference.primary_url}/health")
+        if not health:
+            raise HTTPException(status_code=502, detail="The TabbyAPI instance is unavailable")
+    return await make_request("GET", url, headers, with_status=True)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST"])
@@ -138,15 +267,37 @@ async def proxy_endpoint(request: Request, path: str, x_api_key: str = Header(No
     headers = {"x-api-key": x_api_key, "Authorization": authorization}
 
     if request.method == "GET":
-        if path == "v1/model/list":
-            health = await make_request("GET", f"{config.configuration.inference.primary_url}/health")
-            if not health:
-                raise HTTPException(status_code=502, detail="The TabbyAPI instance is unavailable")
-        result = await make_request("GET", url, headers)
-        return result
+        if (ttl := GET_CACHE_TTLS.get(path)) is None:
+            _, result = await fetch_get(path, url, headers)
+            return result
+
+        key = make_key(path, x_api_key, authorization)
+        if (cached := get_cache.get(key)) is None:
+            generation = get_cache.generation
+            status, result = await fetch_get(path, url, headers)
+            # Errors are passed through as they are and never cached
+            if not 200 <= status < 300 or not isinstance(result, dict) or "detail" in result or "error" in result:
+                return JSONResponse(status_code=status, content=result)
+
+            content = json.dumps(result).encode("utf-8")
+            cached = (content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+            # A load finishing while the request was in flight may have made the result stale
+            if get_cache.generation == generation:
+                get_cache.put(key, cached, ttl)
+
+        content, etag = cached
+        # Clients always revalidate, so invalidation on model loads reaches them right away
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers=cache_headers)
+        return Response(content=content, media_type="application/json", headers=cache_headers)
 
     body = await request.body()
-    return await make_request("POST", url, headers, body)
+    result = await make_request("POST", url, headers, body)
+    if path.startswith(INVALIDATING_PREFIXES):
+        get_cache.clear()
+        variables.model_checked_at = 0.0
+    return result
 
 
 @asynccontextmanager
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+def make_key(*parts: Any) -> str:
+    """Build a stable cache key from arbitrary JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Least recently used cache bounded by the approximate size of the stored values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        if (entry := self._entries.get(key)) is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.size -= entry[1]
+
+        self._entries[key] = (value, size)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+class TTLCache:
+    """Cache whose entries expire after a per-entry time to live, bounded by the number of entries."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # Bumped on every clear, lets callers drop values fetched before an invalidation
+        self.generation = 0
+        self._entries: dict[str, tuple[float, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        if (entry := self._entries.get(key)) is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        now = time.monotonic()
+        self._entries.pop(key, None)
+
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] > now}
+
+        # Entries are kept in insertion order, so the first one is the oldest
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+        self._entries[key] = (now + ttl, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.generation += 1
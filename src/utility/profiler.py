@@ -0,0 +1,135 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter
+from typing import Any
+
+Frame = tuple[str, str, int]
+Stack = tuple[Frame, ...]
+
+MAX_DURATION = 120
+
+
+class SamplingProfiler:
+    """Samples the stack of the event loop thread from a background thread and tracks event loop lag."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, lag_threshold: float = 0.1):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.duration = 0.0
+        self.samples: Counter[Stack] = Counter()
+        self.blocked: list[dict[str, Any]] = []
+        self.max_lag = 0.0
+        self._last_tick = time.perf_counter()
+        self._blocked_tick = None
+        self._stop = threading.Event()
+
+    async def run(self, seconds: float) -> None:
+        """Profile the event loop thread for the given number of seconds."""
+        sampler = threading.Thread(target=self._sample, name="mmp-profiler", daemon=True)
+        start = self._last_tick = time.perf_counter()
+        sampler.start()
+
+        try:
+            while (now := time.perf_counter()) - start < seconds:
+                self._last_tick = now
+                await asyncio.sleep(self.interval)
+                self.max_lag = max(self.max_lag, time.perf_counter() - now - self.interval)
+        finally:
+            self.duration = time.perf_counter() - start
+            self._stop.set()
+            await asyncio.to_thread(sampler.join)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            if (frame := sys._current_frames().get(self.thread_id)) is None:
+                continue
+
+            lines = self._walk(frame)
+            self.samples[tuple((name, file, line) for name, file, line, _ in lines)] += 1
+
+            last_tick = self._last_tick
+            lag = time.perf_counter() - last_tick
+            if lag < self.lag_threshold:
+                continue
+
+            # Keep the stack from the first sample of a stall, that is the code which blocked the loop
+            if self._blocked_tick != last_tick:
+                self._blocked_tick = last_tick
+                stack = [self._format_frame((name, file, lineno)) for name, file, _, lineno in reversed(lines)]
+                self.blocked.append({"lag_ms": 0.0, "stack": stack})
+            self.blocked[-1]["lag_ms"] = round(lag * 1000, 2)
+
+    @staticmethod
+    def _walk(frame) -> list[tuple[str, str, int, int]]:
+        """Walk a stack root first, recording both the function and the currently executing line."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    @staticmethod
+    def _format_frame(frame: Frame) -> str:
+        return f"{frame[0]} ({frame[1]}:{frame[2]})"
+
+    def collapsed(self) -> str:
+        """Render the samples in the collapsed stack format used by flamegraph.pl and speedscope."""
+        return "\n".join(
+            f"{';'.join(self._format_frame(f) for f in stack)} {count}" for stack, count in self.samples.most_common()
+        )
+
+    def collapsed_archive(self) -> bytes:
+        """Bundle the collapsed stacks and the lag report of the same capture into a zip archive."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("profile.collapsed", self.collapsed())
+            archive.writestr("lag.json", json.dumps(self.lag(), indent=2))
+        return buffer.getvalue()
+
+    def speedscope(self) -> dict[str, Any]:
+        """Render the samples as a speedscope sampled profile, with the lag report in an extra top-level key."""
+        frames: dict[Frame, int] = {}
+        samples = []
+        weights = []
+        # Samples arrive less often than the nominal interval, so weight them by the measured rate
+        weight = self.duration / max(sum(self.samples.values()), 1)
+        for stack, count in self.samples.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * weight)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "MultiModelProxy",
+            "name": "MultiModelProxy event loop",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": "event loop",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "lag": self.lag(),
+        }
+
+    def lag(self) -> dict[str, Any]:
+        """Report the event loop lag and the stacks of the stalls above the lag threshold."""
+        return {
+            "duration": round(self.duration, 3),
+            "samples": sum(self.samples.values()),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "blocked": self.blocked,
+        }
@@ -9,3 +9,5 @@ class Variables:
         self.timeout = timeout
         self.last_message = ""
         self.last_expanded = ""
+        self.loaded_model = None
+        self.model_checked_at = 0.0